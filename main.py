@@ -1,158 +1,504 @@
 import os
+import re
+import stat
 
 import sys
-from typing import List, Set, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
 from datetime import datetime
-from thefuzz import fuzz
+import numpy as np
 import pandas as pd
+from rapidfuzz import fuzz, process
+from rapidfuzz.utils import default_process
+from xlsxwriter.exceptions import DuplicateWorksheetName
+from xlsxwriter.workbook import Workbook
 
-def should_ignore(path: str, name: str, ignore_paths: Set[str], ignore_exts: Set[str], ignore_names: Set[str], ignore_hidden: bool, allowed_exts: Set[str]) -> bool:
-    # Check allowed extensions
-    if allowed_exts:
-        _, ext = os.path.splitext(name)
-        if ext.lower() not in allowed_exts:
+try:
+    from numba import njit
+except ImportError:
+    # numba is optional; without it the union-find kernels run as plain Python
+    def njit(*args, **kwargs):
+        return lambda func: func
+
+def make_ignore_matcher(ignore_paths: Set[str], ignore_exts: Set[str], ignore_names: Set[str], ignore_hidden: bool, allowed_exts: Set[str]) -> Callable[[str, str, bool], bool]:
+    """
+    Builds should_ignore(path, name, is_dir) once per scan with the ignore rules captured.
+    allowed_exts only applies to files, never to directories.
+    """
+    ignore_paths = frozenset(ignore_paths)
+    ignore_exts = frozenset(ignore_exts)
+    allowed_exts = frozenset(allowed_exts)
+    # Names are matched exactly against both ignore lists
+    ignore_names_or_paths = frozenset(ignore_names) | ignore_paths
+    # One regex for every ignore path, anchored on separators so "bin" never matches "cabin".
+    # Covers both single components ("node_modules" anywhere) and relative paths ("src/legacy")
+    ignore_regex = None
+    if ignore_paths:
+        sep = re.escape(os.sep)
+        alternatives = "|".join(re.escape(os.path.normpath(ign)) for ign in ignore_paths)
+        ignore_regex = re.compile(rf"(?:^|{sep})(?:{alternatives})(?:{sep}|$)")
+
+    def should_ignore(path: str, name: str, is_dir: bool = False) -> bool:
+        ext = os.path.splitext(name)[1].lower()
+
+        # Check allowed extensions
+        if allowed_exts and not is_dir and ext not in allowed_exts:
             return True
 
-    # Check hidden
-    if ignore_hidden and name.startswith('.'):
-        return True
+        # Check hidden
+        if ignore_hidden and name.startswith('.'):
+            return True
 
-    # Check filename/directory name exactly
-    if name in ignore_names or name in ignore_paths:
-        return True
-    
-    # Check extension
-    _, ext = os.path.splitext(name)
-    if ext.lower() in ignore_exts:
-        return True
-    
-    # Check full path components allows ignoring "node_modules" specifically everywhere
-    path_parts = path.split(os.sep)
-    for part in path_parts:
-        if part in ignore_paths:
+        # Check filename/directory name exactly
+        if name in ignore_names_or_paths:
+            return True
+
+        # Check extension
+        if ext in ignore_exts:
+            return True
+
+        # Check hidden path components
+        if ignore_hidden and any(part.startswith('.') for part in path.split(os.sep)):
+            return True
+
+        # Check ignore paths against the full path
+        if ignore_regex is not None and ignore_regex.search(path):
             return True
-        if ignore_hidden and part.startswith('.'):
-             return True
-             
-    # Check relative path matching (e.g. "src/legacy")
-    for ign in ignore_paths:
-        # Normalize ignore path to system separator
-        norm_ign = os.path.normpath(ign)
-        if norm_ign in path: 
-            # Check boundaries to avoid partial name match (e.g. ignore "bin" matching "cabin")
-            if f"{os.sep}{norm_ign}{os.sep}" in f"{os.sep}{path}{os.sep}":
-                return True
-            
-    return False
+
+        return False
+
+    return should_ignore
+
+# Per-scan stat cache: path -> stat result, or None if the path could not be stat'ed
+_stat_cache: Dict[str, Optional[os.stat_result]] = {}
+
+def cached_stat(path: str) -> Optional[os.stat_result]:
+    """Stats path at most once per scan, caching failures too so missing paths aren't retried."""
+    try:
+        return _stat_cache[path]
+    except KeyError:
+        pass
+    try:
+        st = os.stat(path)
+    except (OSError, ValueError):
+        st = None
+    _stat_cache[path] = st
+    return st
 
 def get_mod_time(path: str) -> datetime:
+    st = cached_stat(path)
+    if st is None:
+        return datetime.min
     try:
-        ts = os.path.getmtime(path)
-        return datetime.fromtimestamp(ts)
-    except Exception:
+        return datetime.fromtimestamp(st.st_mtime)
+    except (OSError, ValueError, OverflowError):
         return datetime.min
 
+# Number of names scored per cdist call when grouping
+CDIST_BLOCK_SIZE = 1024
+
+# Number of sheets scanned and grouped concurrently
+SCAN_WORKERS = 4
+
+# Excel number format for date columns in the report
+DATE_NUM_FORMAT = 'dd/mm/yyyy hh:mm:ss'
+
+# Representative file names matching these whole words are highlighted red in the report
+FLAGGED_NAME_PATTERN = re.compile(r'\b(att|attachment|attatchment|draft)\b', re.IGNORECASE)
+
+if sys.platform == 'win32':
+    import ctypes
+    from ctypes import wintypes
+
+    _kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+    _kernel32.FindFirstFileExW.argtypes = [wintypes.LPCWSTR, ctypes.c_int, ctypes.POINTER(wintypes.WIN32_FIND_DATAW), ctypes.c_int, ctypes.c_void_p, wintypes.DWORD]
+    _kernel32.FindFirstFileExW.restype = wintypes.HANDLE
+    _kernel32.FindNextFileW.argtypes = [wintypes.HANDLE, ctypes.POINTER(wintypes.WIN32_FIND_DATAW)]
+    _kernel32.FindNextFileW.restype = wintypes.BOOL
+    _kernel32.FindClose.argtypes = [wintypes.HANDLE]
+    _kernel32.FindClose.restype = wintypes.BOOL
+
+    _INVALID_HANDLE_VALUE = wintypes.HANDLE(-1).value
+    _FIND_EX_INFO_BASIC = 1  # skip the 8.3 short name lookup
+    _FIND_EX_SEARCH_NAME_MATCH = 0
+    _FIND_FIRST_EX_LARGE_FETCH = 2  # larger directory query buffer, fewer round trips
+    _ERROR_FILE_NOT_FOUND = 2
+    _ERROR_NO_MORE_FILES = 18
+    _FILE_ATTRIBUTE_READONLY = 0x1
+    _FILE_ATTRIBUTE_DIRECTORY = 0x10
+    _FILE_ATTRIBUTE_REPARSE_POINT = 0x400
+    # Only real links count; OneDrive placeholders are reparse points too and must still be walked
+    _LINK_REPARSE_TAGS = (0xA000000C, 0xA0000003)  # IO_REPARSE_TAG_SYMLINK, IO_REPARSE_TAG_MOUNT_POINT
+
+    def _filetime_to_timestamp(ft: "wintypes.FILETIME") -> float:
+        # FILETIME counts 100ns intervals since 1601-01-01
+        return ((ft.dwHighDateTime << 32) | ft.dwLowDateTime) / 10_000_000 - 11644473600
+
+    class _FindEntry:
+        """The subset of os.DirEntry used by walk_files, filled from one WIN32_FIND_DATAW record."""
+        __slots__ = ('name', 'path', '_attrs', '_is_link', '_stat')
+
+        def __init__(self, dir_path: str, data: "wintypes.WIN32_FIND_DATAW"):
+            self.name = data.cFileName
+            self.path = os.path.join(dir_path, self.name)
+            self._attrs = data.dwFileAttributes
+            self._is_link = bool(self._attrs & _FILE_ATTRIBUTE_REPARSE_POINT) and data.dwReserved0 in _LINK_REPARSE_TAGS
+            mode = (stat.S_IFDIR | 0o777) if self._attrs & _FILE_ATTRIBUTE_DIRECTORY else (stat.S_IFREG | 0o666)
+            if self._attrs & _FILE_ATTRIBUTE_READONLY:
+                mode &= ~0o222
+            size = (data.nFileSizeHigh << 32) | data.nFileSizeLow
+            self._stat = os.stat_result((mode, 0, 0, 0, 0, 0, size, _filetime_to_timestamp(data.ftLastAccessTime), _filetime_to_timestamp(data.ftLastWriteTime), _filetime_to_timestamp(data.ftCreationTime)))
+
+        def is_dir(self) -> bool:
+            return bool(self._attrs & _FILE_ATTRIBUTE_DIRECTORY)
+
+        def is_symlink(self) -> bool:
+            return self._is_link
+
+        def stat(self) -> os.stat_result:
+            # The find record describes the link itself, so resolve links with a real stat
+            if self._is_link:
+                st = cached_stat(self.path)
+                if st is None:
+                    raise FileNotFoundError(self.path)
+                return st
+            return self._stat
+
+    class _FindFileIterator:
+        """
+        os.scandir replacement built on FindFirstFileExW/FindNextFileW with FindExInfoBasic and
+        FIND_FIRST_EX_LARGE_FETCH. Each record already carries attributes and mtime, so no
+        per-file stat call is needed.
+        """
+
+        def __init__(self, dir_path: str):
+            self._dir_path = dir_path
+            self._data = wintypes.WIN32_FIND_DATAW()
+            self._handle = _kernel32.FindFirstFileExW(os.path.join(dir_path, '*'), _FIND_EX_INFO_BASIC, ctypes.byref(self._data), _FIND_EX_SEARCH_NAME_MATCH, None, _FIND_FIRST_EX_LARGE_FETCH)
+            if self._handle == _INVALID_HANDLE_VALUE:
+                self._handle = None
+                err = ctypes.get_last_error()
+                if err != _ERROR_FILE_NOT_FOUND:
+                    raise ctypes.WinError(err)
+
+        def __iter__(self) -> Iterator["_FindEntry"]:
+            if self._handle is None:
+                return
+            while True:
+                if self._data.cFileName not in ('.', '..'):
+                    yield _FindEntry(self._dir_path, self._data)
+                if not _kernel32.FindNextFileW(self._handle, ctypes.byref(self._data)):
+                    err = ctypes.get_last_error()
+                    if err != _ERROR_NO_MORE_FILES:
+                        raise ctypes.WinError(err)
+                    return
+
+        def close(self) -> None:
+            if self._handle is not None:
+                _kernel32.FindClose(self._handle)
+                self._handle = None
+
+        def __enter__(self) -> "_FindFileIterator":
+            return self
+
+        def __exit__(self, *exc) -> None:
+            self.close()
+
+    _scandir = _FindFileIterator
+else:
+    _scandir = os.scandir
+
+def walk_files(top: str, should_ignore: Callable[[str, str, bool], bool]) -> Iterator[Tuple[str, datetime, str]]:
+    """
+    Walks top, yielding (full_path, mod_time_dt, ext_lower) for every file not ignored.
+    Uses os.scandir, or batched FindFirstFileExW enumeration on Windows. Either way each
+    entry's file type is already known, so a file costs at most one stat call.
+    """
+    pending = [top]
+    while pending:
+        try:
+            entries = _scandir(pending.pop())
+        except OSError:
+            # Unreadable directory, skipped silently like os.walk does
+            continue
+        
+        with entries:
+            entry_iter = iter(entries)
+            while True:
+                try:
+                    entry = next(entry_iter)
+                except StopIteration:
+                    break
+                except OSError:
+                    # Listing failed partway through; keep what was read and move on, like os.walk
+                    break
+                
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                
+                if is_dir:
+                    # Prune ignored directories before descending; symlinks are not followed
+                    if not entry.is_symlink() and not should_ignore(entry.path, entry.name, True):
+                        pending.append(entry.path)
+                    continue
+                
+                if should_ignore(entry.path, entry.name, False):
+                    continue
+                
+                try:
+                    mod_time = datetime.fromtimestamp(entry.stat().st_mtime)
+                except (OSError, ValueError, OverflowError):
+                    mod_time = datetime.min
+                yield entry.path, mod_time, os.path.splitext(entry.name)[1].lower()
+
+@njit(cache=True)
+def _dsu_find(parent: np.ndarray, x: int) -> int:
+    while parent[x] != x:
+        parent[x] = parent[parent[x]]  # path halving
+        x = parent[x]
+    return x
+
+@njit(cache=True)
+def dsu_union(parent: np.ndarray, rows: np.ndarray, cols: np.ndarray) -> None:
+    """
+    Unions every (rows[k], cols[k]) pair into the disjoint-set forest parent, in place.
+    The lower index always becomes the root so groups stay in sorted-path order.
+    """
+    for k in range(rows.size):
+        root_r = _dsu_find(parent, rows[k])
+        root_c = _dsu_find(parent, cols[k])
+        if root_r < root_c:
+            parent[root_c] = root_r
+        elif root_c < root_r:
+            parent[root_r] = root_c
+
+@njit(cache=True)
+def dsu_roots(parent: np.ndarray) -> np.ndarray:
+    """Returns the root of every element of the disjoint-set forest parent."""
+    roots = np.empty_like(parent)
+    for i in range(parent.size):
+        roots[i] = _dsu_find(parent, i)
+    return roots
+
 def normalize_for_match(filename: str) -> str:
     """Removes extension and converts to lowercase for better matching."""
     return os.path.splitext(filename)[0].lower()
 
-def group_files(file_list: List[Tuple[str, datetime]], threshold: int = 80) -> List[List[Tuple[str, datetime]]]:
+def group_files(file_list: List[Tuple[str, datetime, str]], threshold: int = 80, workers: int = -1) -> List[List[Tuple[str, datetime, str]]]:
     """
     Groups files based on fuzzy matching of their names.
-    file_list is a list of (path, mod_time_dt) tuples.
+    file_list is a list of (path, mod_time_dt, ext_lower) tuples.
+    workers is the number of threads rapidfuzz scores with (-1 uses every core).
     Returns a list of groups.
     """
     groups = []
     
     # Sort by path for consistent iteration
     sorted_files = sorted(file_list, key=lambda x: x[0])
-    
-    assigned_indices = set()
-    
-    for i in range(len(sorted_files)):
-        if i in assigned_indices:
-            continue
-            
-        current_file = sorted_files[i]
-        current_name = os.path.basename(current_file[0])
-        norm_name = normalize_for_match(current_name)
-        
-        # Start a new group
-        current_group = [current_file]
-        assigned_indices.add(i)
-        
-        # Look for matches in the REST of the list
-        for j in range(i + 1, len(sorted_files)):
-            if j in assigned_indices:
-                continue
-                
-            other_file = sorted_files[j]
-            other_name = os.path.basename(other_file[0])
-            norm_other = normalize_for_match(other_name)
-            
-            # Simple exact match of normalized name (covers extensions case)
-            if norm_name == norm_other:
-                current_group.append(other_file)
-                assigned_indices.add(j)
-                continue
-                
-            # Fuzzy match
-            score = fuzz.ratio(norm_name, norm_other)
-            if score >= threshold:
-                current_group.append(other_file)
-                assigned_indices.add(j)
-                
-        groups.append(current_group)
+    if not sorted_files:
+        return groups
+    
+    # Normalize and preprocess each name once so cdist can skip its own processor
+    stems = [normalize_for_match(os.path.basename(p)) for p, _, _ in sorted_files]
+    norm_names = [default_process(stem) for stem in stems]
+    
+    # Union every matching pair so grouping is transitive across the whole group
+    parent = np.arange(len(sorted_files), dtype=np.intp)
+    
+    # Simple exact match of normalized name (covers extensions case, and names that
+    # default_process reduces to an empty string, which are kept out of fuzzy matching)
+    first_seen = {}
+    same_rows, same_cols = [], []
+    for i, stem in enumerate(stems):
+        j = first_seen.setdefault(stem, i)
+        if j != i:
+            same_rows.append(j)
+            same_cols.append(i)
+    dsu_union(parent, np.array(same_rows, dtype=np.intp), np.array(same_cols, dtype=np.intp))
+    
+    # score_cutoff lets rapidfuzz abandon a pair as soon as it cannot reach threshold.
+    # Scores are rounded to whole numbers (as thefuzz did) before the threshold test, so
+    # anything that rounds up to threshold must survive the cutoff
+    cutoff = max(0.0, threshold - 0.5)
+    
+    # fuzz.ratio is 200 * common / (len_a + len_b), so a pair can only reach the cutoff when
+    # the longer name is at most (200 - cutoff) / cutoff times the shorter one.
+    # Walk the names shortest first and score each block only against the later names
+    # inside that length window; this prunes pairs losslessly and bounds memory per block.
+    # Names default_process empties (no letters or digits) are left out: ratio("", "") is
+    # 100, so they would all merge; the exact match above is the only way they can join
+    candidates = np.array([i for i, name in enumerate(norm_names) if name], dtype=np.intp)
+    order = candidates[np.argsort([len(norm_names[i]) for i in candidates], kind="stable")]
+    by_len = [norm_names[i] for i in order]
+    lengths = np.array([len(name) for name in by_len])
+    for start in range(0, len(by_len), CDIST_BLOCK_SIZE):
+        end = min(start + CDIST_BLOCK_SIZE, len(by_len))
+        if cutoff > 0:
+            stop = int(np.searchsorted(lengths, lengths[end - 1] * (200 - cutoff) / cutoff, side="right"))
+        else:
+            stop = len(by_len)
+        block = process.cdist(by_len[start:end], by_len[start:stop], scorer=fuzz.ratio, processor=None, score_cutoff=cutoff, dtype=np.uint8, workers=workers)
+        rows, cols = np.nonzero(np.triu(block >= threshold, k=1))
+        dsu_union(parent, order[rows + start], order[cols + start])
+    
+    # Bucket indices by root; dicts keep first-seen order
+    buckets = {}
+    for i, root in enumerate(dsu_roots(parent).tolist()):
+        buckets.setdefault(root, []).append(sorted_files[i])
+    groups.extend(buckets.values())
         
     return groups
 
-def export_to_excel(groups: List[List[Tuple[str, datetime]]], output_file: str):
+def build_sheet_df(paths: List[str], mtimes: List[datetime], exts: List[str], group_ids: List[int]) -> pd.DataFrame:
     """
-    Exports the grouped files to an Excel file with specific columns.
+    Builds the report rows from flat per-file arrays, one row per group id.
+    exts holds each file's lowercased extension as collected.
+    The representative File Name is the most recently modified file, without extension.
     """
-    data = []
-    for group in groups:
-        # Determine group properties
-        
-        # 1. All File Names
-        all_names = [os.path.basename(f[0]) for f in group]
-        all_names_str = ", ".join(all_names)
-        
-        # 2. PDF / Word Exists
-        pdf_exists = any(f[0].lower().endswith('.pdf') for f in group)
-        word_exists = any(f[0].lower().endswith(('.doc', '.docx')) for f in group)
-        
-        # 3. Last Modified (Max of group)
-        last_modified = max((f[1] for f in group), default=datetime.min)
-        
-        # 4. File Name (Representative)
-        # We can use the name of the most recently modified file, without extension
-        most_recent_file = max(group, key=lambda x: x[1])
-        base_name = os.path.splitext(os.path.basename(most_recent_file[0]))[0]
-        
-        data.append({
-            "File Name": base_name,
-            "PDF Exists": "Yes" if pdf_exists else "No",
-            "Word Doc Exists": "Yes" if word_exists else "No",
-            "Last Modified": last_modified,
-            "All File Names": all_names_str
-        })
-        
-    df = pd.DataFrame(data)
+    names = np.array([os.path.basename(p) for p in paths], dtype=object)
+    exts = np.array(exts, dtype=object)
+    df_files = pd.DataFrame({
+        "name": names,
+        "mtime": np.array(mtimes, dtype="datetime64[us]"),
+        "gid": group_ids,
+        "is_pdf": exts == ".pdf",
+        "is_word": np.isin(exts, (".doc", ".docx")),
+    })
+    agg = df_files.groupby("gid").agg(
+        last_mod=("mtime", "max"),
+        names=("name", ", ".join),
+        has_pdf=("is_pdf", "any"),
+        has_word=("is_word", "any"),
+    )
     
-    # Format date column if not empty
-    if not df.empty and pd.api.types.is_datetime64_any_dtype(df["Last Modified"]):
-        df["Last Modified"] = df["Last Modified"].dt.strftime('%d/%m/%Y %H:%M:%S')
-    elif not df.empty:
-        # Fallback if somehow not datetime (shouldn't happen with default=min)
-        pass
+    # df_files has a RangeIndex, so idxmax labels index straight into the flat arrays
+    rep_idx = df_files.groupby("gid")["mtime"].idxmax().to_numpy()
+    rep_names = pd.Series(names[rep_idx])
+    # Strip the extension only where one was collected (rsplit would eat a dotfile's name)
+    rep_stems = rep_names.where(exts[rep_idx] == "", rep_names.str.rsplit(".", n=1).str[0])
+    
+    return pd.DataFrame({
+        "File Name": rep_stems.to_numpy(),
+        "PDF Exists": np.where(agg["has_pdf"], "Yes", "No"),
+        "Word Doc Exists": np.where(agg["has_word"], "Yes", "No"),
+        "Last Modified": agg["last_mod"].to_numpy(),
+        "All File Names": agg["names"].to_numpy(),
+    })
+
+def groups_to_df(groups: List[List[Tuple[str, datetime, str]]]) -> pd.DataFrame:
+    """Flattens the output of group_files and builds the report rows for it."""
+    paths = [f[0] for group in groups for f in group]
+    mtimes = [f[1] for group in groups for f in group]
+    exts = [f[2] for group in groups for f in group]
+    group_ids = [gid for gid, group in enumerate(groups) for _ in group]
+    return build_sheet_df(paths, mtimes, exts, group_ids)
+
+def write_sheet(workbook: Workbook, sheet_name: str, df: pd.DataFrame, highlight: Optional[re.Pattern] = None) -> None:
+    """
+    Writes df to a new worksheet row by row, as constant_memory workbooks require
+    (DataFrame.to_excel writes column by column and would lose cells there).
+    File Name cells matching highlight are filled red.
+    """
+    worksheet = workbook.add_worksheet(sheet_name)
+    header_format = workbook.add_format({'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'})
+    red_format = workbook.add_format({'bg_color': '#FF0000'})
+    date_format = workbook.add_format({'num_format': DATE_NUM_FORMAT})
+    
+    # Dates are written as Excel serials and formatted by the column, not as strings
+    date_cols = [i for i, col in enumerate(df.columns) if pd.api.types.is_datetime64_any_dtype(df[col])]
+    for col_idx in date_cols:
+        worksheet.set_column(col_idx, col_idx, 20, date_format)
+    
+    worksheet.write_row(0, 0, df.columns.tolist(), header_format)
+    for row_idx, row in enumerate(df.itertuples(index=False, name=None), start=1):
+        if date_cols:
+            row = list(row)
+            for col_idx in date_cols:
+                # Unknown mtimes (datetime.min) fall before Excel's epoch; leave them blank
+                if pd.isna(row[col_idx]) or row[col_idx].year < 1900:
+                    row[col_idx] = None
         
+        file_name = row[0]
+        if highlight is not None and isinstance(file_name, str) and highlight.search(file_name):
+            worksheet.write(row_idx, 0, file_name, red_format)
+        else:
+            worksheet.write(row_idx, 0, file_name)
+        worksheet.write_row(row_idx, 1, row[1:])
+
+def export_to_excel(groups: List[List[Tuple[str, datetime, str]]], output_file: str):
+    """
+    Exports the grouped files to an Excel file with specific columns.
+    """
+    df = groups_to_df(groups)
+    
     try:
-        df.to_excel(output_file, index=False)
+        with pd.ExcelWriter(output_file, engine='xlsxwriter', engine_kwargs={'options': {'constant_memory': True}}) as writer:
+            write_sheet(writer.book, "Sheet1", df)
         print(f"Excel report saved to: {output_file}")
     except Exception as e:
         print(f"Error saving Excel report: {e}")
 
+def build_sheet(sheet_name: str, group_paths: List[str], should_ignore: Callable[[str, str, bool], bool], group_workers: int, log: List[str]) -> Optional[pd.DataFrame]:
+    """
+    Scans every path belonging to one sheet, groups the files found and returns the sheet's rows.
+    Returns None if no files were found. Safe to run from a worker thread; progress messages
+    are appended to log instead of printed so the caller can print them in sheet order.
+    group_workers is the number of rapidfuzz threads used for this sheet's grouping.
+    """
+    log.append(f"Processing Sheet: '{sheet_name}' with {len(group_paths)} path(s)")
+    
+    all_collected_files_for_sheet = []
+    
+    for target_path in group_paths:
+        log.append(f"  Scanning path: {target_path}")
+        target_path_abs = os.path.abspath(target_path)
+        
+        target_stat = cached_stat(target_path_abs)
+        if target_stat is None:
+            log.append(f"    Warning: Path '{target_path_abs}' does not exist. Skipping.")
+            continue
+            
+        # Collect files from this specific path
+        current_path_files = []
+        if stat.S_ISREG(target_stat.st_mode):
+            name = os.path.basename(target_path_abs)
+            if not should_ignore(target_path_abs, name, False):
+                try:
+                    rel_p = os.path.relpath(target_path_abs)
+                except ValueError:
+                    rel_p = target_path_abs
+                mod_time = get_mod_time(target_path_abs)
+                current_path_files.append((rel_p, mod_time, os.path.splitext(name)[1].lower()))
+        else:
+            # Resolve the relative form of the scan root once, then build each file's
+            # relative path by slicing instead of calling os.path.relpath per file
+            base = target_path_abs.rstrip(os.sep) + os.sep
+            base_len = len(base)
+            try:
+                rel_base = os.path.relpath(target_path_abs)
+            except ValueError:
+                rel_base = target_path_abs
+            rel_prefix = '' if rel_base == os.curdir else os.path.join(rel_base, '')
+            
+            for full_path, mod_time, ext in walk_files(target_path_abs, should_ignore):
+                rel_path = rel_prefix + full_path[base_len:] if full_path.startswith(base) else full_path
+                current_path_files.append((rel_path, mod_time, ext))
+        
+        all_collected_files_for_sheet.extend(current_path_files)
+
+    # Group files for this ENTIRE sheet (across all paths)
+    if not all_collected_files_for_sheet:
+        log.append(f"  No valid files found for sheet '{sheet_name}'. Skipping.")
+        return None
+
+    log.append(f"  Found {len(all_collected_files_for_sheet)} total files for sheet '{sheet_name}'. Grouping...")
+    grouped_files = group_files(all_collected_files_for_sheet, threshold=80, workers=group_workers)
+    
+    # Create DataFrame for this sheet
+    return groups_to_df(grouped_files)
+
 def scan_files(paths: List[str], ignore_paths: List[str] = None, ignore_exts: List[str] = None, ignore_names: List[str] = None, ignore_hidden: bool = True, allowed_exts: List[str] = None, output_file: str = "scan_results.xlsx", sheet_names: List[str] = None) -> None:
     """
     Scans, groups, and exports file data.
@@ -173,12 +519,15 @@ def scan_files(paths: List[str], ignore_paths: List[str] = None, ignore_exts: Li
     allowed_exts_set = {e if e.startswith('.') else f'.{e}' for e in allowed_exts}
     allowed_exts_set = {e.lower() for e in allowed_exts_set}
     
+    should_ignore = make_ignore_matcher(ign_paths_set, ign_exts_set, ign_names_set, ignore_hidden, allowed_exts_set)
+    
     print(f"Scanning Paths: {paths}")
     print(f"Ignoring Paths: {ign_paths_set}")
     print("-" * 40)
 
     try:
-        with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
+        # constant_memory streams each row to disk as soon as the next one starts
+        with pd.ExcelWriter(output_file, engine='xlsxwriter', engine_kwargs={'options': {'constant_memory': True}}) as writer:
             sheets_written = 0
             
             # 1. Group paths by sheet_name
@@ -209,139 +558,43 @@ def scan_files(paths: List[str], ignore_paths: List[str] = None, ignore_exts: Li
                     sheet_groups[s_name] = []
                 sheet_groups[s_name].append(target_path)
 
-            # 2. Process each Group (Sheet)
-            for sheet_name, group_paths in sheet_groups.items():
-                print(f"Processing Sheet: '{sheet_name}' with {len(group_paths)} path(s)")
-                
-                all_collected_files_for_sheet = []
+            # 2. Scan and group every sheet in a thread pool; stat/readdir and cdist release the GIL
+            # Split the cores between the sheets actually running at once, so a single large
+            # sheet still saturates every core while several sheets don't oversubscribe them
+            concurrent_sheets = max(1, min(SCAN_WORKERS, len(sheet_groups)))
+            group_workers = max(1, (os.cpu_count() or 1) // concurrent_sheets)
+            
+            with ThreadPoolExecutor(max_workers=SCAN_WORKERS) as executor:
+                futures = []
+                for sheet_name, group_paths in sheet_groups.items():
+                    log = []
+                    futures.append((sheet_name, log, executor.submit(build_sheet, sheet_name, group_paths, should_ignore, group_workers, log)))
                 
-                for target_path in group_paths:
-                    print(f"  Scanning path: {target_path}")
-                    target_path_abs = os.path.abspath(target_path)
-                    
-                    if not os.path.exists(target_path_abs):
-                        print(f"    Warning: Path '{target_path_abs}' does not exist. Skipping.")
+                # 3. Write the sheets in their original order on this thread
+                for sheet_name, log, future in futures:
+                    try:
+                        df = future.result()
+                    finally:
+                        # Print the sheet's progress only once it's done so sheets don't interleave
+                        for line in log:
+                            print(line)
+                    if df is None:
                         continue
-                        
-                    # Collect files from this specific path
-                    current_path_files = []
-                    if os.path.isfile(target_path_abs):
-                        name = os.path.basename(target_path_abs)
-                        if not should_ignore(target_path_abs, name, ign_paths_set, ign_exts_set, ign_names_set, ignore_hidden, allowed_exts_set):
-                            try:
-                                rel_p = os.path.relpath(target_path_abs)
-                            except ValueError:
-                                rel_p = target_path_abs
-                            mod_time = get_mod_time(target_path_abs)
-                            current_path_files.append((rel_p, mod_time))
-                    else:
-                        for root, dirs, files in os.walk(target_path_abs):
-                            dirs_to_remove = []
-                            for d in dirs:
-                                full_dir_path = os.path.join(root, d)
-                                if should_ignore(full_dir_path, d, ign_paths_set, ign_exts_set, ign_names_set, ignore_hidden, allowed_exts=None): 
-                                     dirs_to_remove.append(d)
-                                
-                            for d in dirs_to_remove:
-                                dirs.remove(d)
-
-                            for file in files:
-                                full_path = os.path.join(root, file)
-                                
-                                if should_ignore(full_path, file, ign_paths_set, ign_exts_set, ign_names_set, ignore_hidden, allowed_exts_set):
-                                    continue
-                                    
-                                try:
-                                    rel_path = os.path.relpath(full_path)
-                                except ValueError:
-                                    rel_path = full_path
-                                
-                                mod_time = get_mod_time(full_path)
-                                current_path_files.append((rel_path, mod_time))
-                    
-                    all_collected_files_for_sheet.extend(current_path_files)
-
-                # Group files for this ENTIRE sheet (across all paths)
-                if not all_collected_files_for_sheet:
-                    print(f"  No valid files found for sheet '{sheet_name}'. Skipping.")
-                    continue
-
-                print(f"  Found {len(all_collected_files_for_sheet)} total files for sheet '{sheet_name}'. Grouping...")
-                grouped_files = group_files(all_collected_files_for_sheet, threshold=80)
-                
-                # Create DataFrame for this sheet
-                data = []
-                for group in grouped_files:
-                    all_names = [os.path.basename(f[0]) for f in group]
-                    all_names_str = ", ".join(all_names)
-                    
-                    pdf_exists = any(f[0].lower().endswith('.pdf') for f in group)
-                    word_exists = any(f[0].lower().endswith(('.doc', '.docx')) for f in group)
-                    
-                    last_modified = max((f[1] for f in group), default=datetime.min)
-                    
-                    most_recent_file = max(group, key=lambda x: x[1])
-                    base_name = os.path.splitext(os.path.basename(most_recent_file[0]))[0]
-                    
-                    data.append({
-                        "File Name": base_name,
-                        "PDF Exists": "Yes" if pdf_exists else "No",
-                        "Word Doc Exists": "Yes" if word_exists else "No",
-                        "Last Modified": last_modified,
-                        "All File Names": all_names_str
-                    })
-                
-                df = pd.DataFrame(data)
                 
-                # Format date column if not empty
-                if not df.empty and pd.api.types.is_datetime64_any_dtype(df["Last Modified"]):
-                    df["Last Modified"] = df["Last Modified"].dt.strftime('%d/%m/%Y %H:%M:%S')
-                
-                # Write to sheet
-                try:
-                    target_sheet_name = sheet_name
-                    if sheets_written > 0 and sheet_name in writer.sheets:
-                         # This check inside loop is tricky because writer.sheets updates.
-                         # But our fallback logic above handles unique names usually?
-                         # Let's rely on try/except for duplicates or just use the counter if we failed before.
-                         pass
-
+                    # Write to sheet
                     try:
-                        df.to_excel(writer, sheet_name=target_sheet_name, index=False)
-                    except ValueError:
-                         # fallback if duplicate
-                         target_sheet_name = f"{sheet_name}_{sheets_written}"
-                         df.to_excel(writer, sheet_name=target_sheet_name, index=False)
-                    
-                    # --- Conditional Formatting ---
-                    # Access the workbook and sheet
-                    workbook = writer.book
-                    worksheet = writer.sheets[target_sheet_name]
-                    
-                    from openpyxl.styles import PatternFill
-                    red_fill = PatternFill(start_color="FF0000", end_color="FF0000", fill_type="solid")
-                    
-                    # Keywords to check (case-insensitive)
-                    keywords = ["att", "attachment", "attatchment"]
-                    
-                    # Iterate over the "File Name" column (Column A, which is col 1)
-                    # min_col=1, max_col=1 ensures we only look at the first column
-                    import re
-                    # Regex pattern for whole words (att, attachment, attatchment, draft)
-                    # \b matches word boundaries
-                    pattern = re.compile(r'\b(att|attachment|attatchment|draft)\b', re.IGNORECASE)
-                    
-                    for row in worksheet.iter_rows(min_row=2, min_col=1, max_col=1): 
-                        for cell in row:
-                            if cell.value and isinstance(cell.value, str):
-                                if pattern.search(cell.value):
-                                    cell.fill = red_fill
-                    # -----------------------------
-
-                    sheets_written += 1
-                    print(f"  Written sheet: {target_sheet_name}")
-                except Exception as e:
-                     print(f"  Error writing sheet '{sheet_name}': {e}")
+                        target_sheet_name = sheet_name
+                        try:
+                            write_sheet(writer.book, target_sheet_name, df, highlight=FLAGGED_NAME_PATTERN)
+                        except DuplicateWorksheetName:
+                             # fallback if duplicate (Excel sheet names are case-insensitive)
+                             target_sheet_name = f"{sheet_name}_{sheets_written}"
+                             write_sheet(writer.book, target_sheet_name, df, highlight=FLAGGED_NAME_PATTERN)
+
+                        sheets_written += 1
+                        print(f"  Written sheet: {target_sheet_name}")
+                    except Exception as e:
+                         print(f"  Error writing sheet '{sheet_name}': {e}")
             
             print("-" * 40)
             if sheets_written > 0:
@@ -353,6 +606,15 @@ def scan_files(paths: List[str], ignore_paths: List[str] = None, ignore_exts: Li
         print(f"Error saving Excel report: {e}")
         import traceback
         traceback.print_exc()
+    finally:
+        # Drop cached stats so the next scan sees fresh metadata
+        _stat_cache.clear()
+
+def _read_lines(file_path: str) -> List[str]:
+    """Reads a text file in one pass, dropping any BOM and replacing undecodable bytes."""
+    with open(file_path, 'rb') as f:
+        raw = f.read()
+    return raw.decode('utf-8-sig', errors='replace').splitlines()
 
 def parse_scan_paths_file(file_path: str) -> Tuple[List[str], List[str]]:
     """
@@ -374,22 +636,7 @@ def parse_scan_paths_file(file_path: str) -> Tuple[List[str], List[str]]:
         return paths, sheet_names
     
     try:
-        # Try UTF-8 first, then fall back to other encodings
-        encodings = ['utf-8', 'utf-8-sig', 'latin-1', 'cp1252']
-        file_content = None
-        
-        for encoding in encodings:
-            try:
-                with open(file_path, 'r', encoding=encoding, errors='replace') as f:
-                    file_content = f.readlines()
-                    break
-            except UnicodeDecodeError:
-                continue
-        
-        if file_content is None:
-            # Last resort: read as binary and decode with errors='replace'
-            with open(file_path, 'rb') as f:
-                file_content = [line.decode('utf-8', errors='replace') for line in f]
+        file_content = _read_lines(file_path)
         
         current_dept = None
         for line in file_content:
@@ -448,22 +695,7 @@ def parse_config_file(file_path: str) -> dict:
         return config
     
     try:
-        # Try UTF-8 first, then fall back to other encodings
-        encodings = ['utf-8', 'utf-8-sig', 'latin-1', 'cp1252']
-        file_content = None
-        
-        for encoding in encodings:
-            try:
-                with open(file_path, 'r', encoding=encoding, errors='replace') as f:
-                    file_content = f.readlines()
-                    break
-            except UnicodeDecodeError:
-                continue
-        
-        if file_content is None:
-            # Last resort: read as binary and decode with errors='replace'
-            with open(file_path, 'rb') as f:
-                file_content = [line.decode('utf-8', errors='replace') for line in f]
+        file_content = _read_lines(file_path)
         
         for line in file_content:
             line = line.strip()
@@ -513,22 +745,7 @@ def parse_ignore_paths_file(file_path: str) -> List[str]:
         return paths
     
     try:
-        # Try UTF-8 first, then fall back to other encodings
-        encodings = ['utf-8', 'utf-8-sig', 'latin-1', 'cp1252']
-        file_content = None
-        
-        for encoding in encodings:
-            try:
-                with open(file_path, 'r', encoding=encoding, errors='replace') as f:
-                    file_content = f.readlines()
-                    break
-            except UnicodeDecodeError:
-                continue
-        
-        if file_content is None:
-            # Last resort: read as binary and decode with errors='replace'
-            with open(file_path, 'rb') as f:
-                file_content = [line.decode('utf-8', errors='replace') for line in f]
+        file_content = _read_lines(file_path)
         
         for line in file_content:
             line = line.strip()
@@ -559,22 +776,7 @@ def parse_ignore_names_file(file_path: str) -> List[str]:
         return names
     
     try:
-        # Try UTF-8 first, then fall back to other encodings
-        encodings = ['utf-8', 'utf-8-sig', 'latin-1', 'cp1252']
-        file_content = None
-        
-        for encoding in encodings:
-            try:
-                with open(file_path, 'r', encoding=encoding, errors='replace') as f:
-                    file_content = f.readlines()
-                    break
-            except UnicodeDecodeError:
-                continue
-        
-        if file_content is None:
-            # Last resort: read as binary and decode with errors='replace'
-            with open(file_path, 'rb') as f:
-                file_content = [line.decode('utf-8', errors='replace') for line in f]
+        file_content = _read_lines(file_path)
         
         for line in file_content:
             line = line.strip()